@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
 """
 Build script to create executables for Windows and Linux using PyInstaller.
+
+onefile vs onedir: a onefile executable is a single portable file, but every
+launch first unpacks its whole archive into a temporary directory, so start-up
+time grows with bundle size and disk speed. A onedir build is a folder with
+the executable next to its libraries; it starts immediately but has to be
+shipped as a whole directory. read_serial is launched often and is built
+onedir by default; the other tools stay onefile. Use --onefile/--onedir to
+force one layout for every target.
 """
+import argparse
 import subprocess
 import sys
 import os
 import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Force UTF-8 encoding for output (helps with Windows)
 if sys.platform == 'win32':
@@ -16,12 +27,16 @@ if sys.platform == 'win32':
         import codecs
         sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
 
-def build_executable(script_name, onefile=True, console=True, hidden_imports=None):
-    """Build an executable using PyInstaller"""
-    print(f"\n{'='*60}")
-    print(f"Building {script_name}...")
-    print(f"{'='*60}\n")
-    
+# Serializes output from builds running in parallel
+print_lock = threading.Lock()
+
+def build_executable(script_name, onefile=True, console=True, hidden_imports=None,
+                     excludes=None, strip=False, optimize=2):
+    """Build an executable using PyInstaller.
+
+    PyInstaller's output is captured and printed in one block when the build
+    finishes, so builds running in parallel don't interleave their logs.
+    """
     cmd = [
         sys.executable, '-m', 'PyInstaller',
         '--clean',
@@ -30,6 +45,11 @@ def build_executable(script_name, onefile=True, console=True, hidden_imports=Non
     
     if onefile:
         cmd.append('--onefile')
+    else:
+        cmd.append('--onedir')
+    
+    # Bytecode optimization level for the bundled modules (2 = python -OO)
+    cmd.extend(['--optimize', str(optimize)])
     
     if console:
         cmd.append('--console')
@@ -41,25 +61,66 @@ def build_executable(script_name, onefile=True, console=True, hidden_imports=Non
         for imp in hidden_imports:
             cmd.extend(['--hidden-import', imp])
     
-    # Platform-specific name
+    # Keep unused transitive dependencies out of the bundle
+    if excludes:
+        for mod in excludes:
+            cmd.extend(['--exclude-module', mod])
+    
+    # Platform-specific binary post-processing; PyInstaller adds the .exe
+    # suffix on Windows itself, so a onedir build isn't named read_serial.exe/
+    name = script_name.replace('.py', '')
     system = platform.system()
     if system == 'Windows':
-        name = script_name.replace('.py', '.exe')
+        # UPX-compressed DLLs (e.g. VCRUNTIME140.dll) can fail to load
+        cmd.append('--noupx')
     else:
-        name = script_name.replace('.py', '')
+        if strip:
+            cmd.append('--strip')
     
     cmd.extend(['--name', name])
     cmd.append(script_name)
     
-    try:
-        result = subprocess.run(cmd, check=True, capture_output=False)
-        print(f"[OK] Successfully built {name}")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"[FAIL] Failed to build {script_name}: {e}")
+    with print_lock:
+        print(f"Started build of {script_name}")
+    
+    # Separate PyInstaller cache per build; --clean wipes it and a shared one
+    # would be deleted from under the other builds
+    env = dict(os.environ, PYINSTALLER_CONFIG_DIR=os.path.abspath(os.path.join('build', 'pyinstaller-cache', name)))
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, errors='replace', env=env)
+    
+    with print_lock:
+        print(f"\n{'='*60}")
+        print(f"Building {script_name}...")
+        print(f"{'='*60}\n")
+        print(result.stdout)
+        if result.returncode == 0:
+            print(f"[OK] Successfully built {name}")
+            return True
+        print(f"[FAIL] Failed to build {script_name}: exit code {result.returncode}")
         return False
 
+def dir_size(path):
+    """Total size in bytes of all files below path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            total += os.path.getsize(os.path.join(root, f))
+    return total
+
 def main():
+    parser = argparse.ArgumentParser(
+        description='Build TinyNav tool executables with PyInstaller'
+    )
+    layout = parser.add_mutually_exclusive_group()
+    layout.add_argument('--onefile', dest='onefile', action='store_const', const=True,
+                        help='Build every target as a single-file executable')
+    layout.add_argument('--onedir', dest='onefile', action='store_const', const=False,
+                        help='Build every target as a directory (fastest start-up)')
+    parser.add_argument('--optimize', type=int, choices=[0, 1, 2], default=2,
+                        help='Bytecode optimization level for bundled modules (default: 2)')
+    args = parser.parse_args()
+    
     # Get the directory where this script is located
     script_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(script_dir)
@@ -69,50 +130,82 @@ def main():
     print(f"Architecture: {platform.machine()}")
     print(f"Working directory: {os.getcwd()}")
     
-    # Build visualize.py
-    build_executable(
-        'visualize.py',
-        onefile=True,
-        console=True,
-        hidden_imports=[
-            'numpy',
-            'pandas',
-            'matplotlib',
-            'matplotlib.backends.backend_agg',
-            'PIL',
-            'PIL._imaging'
-        ]
-    )
-    
-    # Build download_log.py
     # Note: on Windows, curses requires windows-curses package
     curses_imports = ['curses']
     if platform.system() == 'Windows':
         curses_imports.append('_curses')
     
-    build_executable(
-        'download_log.py',
-        onefile=True,
-        console=True,
-        hidden_imports=['serial', 'serial.tools', 'serial.tools.list_ports'] + curses_imports
-    )
+    builds = [
+        dict(
+            script_name='visualize.py',
+            onefile=True,
+            console=True,
+            hidden_imports=[
+                'numpy',
+                'pandas',
+                'matplotlib',
+                'PIL',
+                'PIL._imaging'
+            ],
+            # visualize only uses matplotlib's colormaps, never pyplot
+            excludes=[
+                'tkinter',
+                'IPython',
+                'pytest',
+                'matplotlib.pyplot',
+                'matplotlib.backends.backend_tkagg',
+                'matplotlib.backends.backend_tkcairo',
+                'matplotlib.backends._backend_tk',
+                # Optional CSV parser; bundling it nearly doubles the size
+                'pyarrow'
+            ]
+        ),
+        dict(
+            script_name='download_log.py',
+            onefile=True,
+            console=True,
+            hidden_imports=['serial', 'serial.tools', 'serial.tools.list_ports'] + curses_imports,
+            excludes=[
+                'numpy',
+                'pandas',
+                'matplotlib',
+                'PIL',
+                'scipy',
+                'tkinter',
+                'IPython',
+                'pytest',
+                'unittest'
+            ],
+            # Not for the numpy builds: strip corrupts numpy's bundled OpenBLAS
+            strip=True
+        ),
+        dict(
+            script_name='read_serial.py',
+            # Launched often: skip the onefile unpack on every start
+            onefile=False,
+            console=True,
+            hidden_imports=[
+                'serial',
+                'serial.tools',
+                'serial.tools.list_ports',
+                'numpy',
+                'matplotlib',
+                'matplotlib.backends.backend_tkagg',
+                'PIL',
+                'PIL._imaging'
+            ],
+            excludes=['pandas', 'tkinter.test', 'IPython']
+        ),
+    ]
     
-    # Build read_serial.py
-    build_executable(
-        'read_serial.py',
-        onefile=True,
-        console=True,
-        hidden_imports=[
-            'serial',
-            'serial.tools',
-            'serial.tools.list_ports',
-            'numpy',
-            'matplotlib',
-            'matplotlib.backends.backend_tkagg',
-            'PIL',
-            'PIL._imaging'
-        ]
-    )
+    for spec in builds:
+        spec['optimize'] = args.optimize
+        if args.onefile is not None:
+            spec['onefile'] = args.onefile
+    
+    # The builds are independent PyInstaller processes, so run them side by side
+    with ThreadPoolExecutor(max_workers=len(builds)) as executor:
+        list(executor.map(lambda spec: build_executable(**spec), builds))
     
     print(f"\n{'='*60}")
     print("Build complete!")
@@ -124,6 +217,9 @@ def main():
             if os.path.isfile(full_path):
                 size_mb = os.path.getsize(full_path) / (1024 * 1024)
                 print(f"  - {item} ({size_mb:.1f} MB)")
+            elif os.path.isdir(full_path):
+                size_mb = dir_size(full_path) / (1024 * 1024)
+                print(f"  - {item}/ ({size_mb:.1f} MB, onedir)")
 
 if __name__ == '__main__':
     main()
@@ -11,9 +11,13 @@ import sys
 import os
 import time
 import curses
+import queue
+import threading
 from datetime import datetime
 import argparse
 
+from serial_utils import LineReader, configure_port
+
 # Parse command-line arguments
 parser = argparse.ArgumentParser(
     description='Download log files from ESP32 SD card via serial',
@@ -36,13 +40,39 @@ BAUD = args.baud
 TIMEOUT = args.timeout
 DOWNLOAD_DIR = args.download_dir
 
+# Minimum time between progress callbacks; redrawing the TUI for every
+# received line costs more than the transfer itself
+PROGRESS_INTERVAL = 0.05
+
+def throttle_progress(callback, interval=PROGRESS_INTERVAL):
+    """Wrap a progress callback so it fires at most once per interval.
+
+    The final (complete) update is always passed through.
+    """
+    last = None
+    
+    def throttled(percent, current, total):
+        nonlocal last
+        now = time.monotonic()
+        if current < total and last is not None and now - last < interval:
+            return
+        last = now
+        callback(percent, current, total)
+    
+    return throttled
+
+
 class SerialFileDownloader:
     def __init__(self, port, baudrate, timeout=5):
         self.ser = serial.Serial(port, baudrate, timeout=timeout)
+        configure_port(self.ser)
         time.sleep(0.5)  # Wait for connection to stabilize
         # Flush any existing data
         self.ser.reset_input_buffer()
         self.ser.reset_output_buffer()
+        self.reader = LineReader(self.ser)
+        # Whether the firmware understands DOWNLOAD_FILE_BIN (None = not probed yet)
+        self.binary_supported = None
     
     def send_command(self, cmd):
         """Send a command to ESP32"""
@@ -54,10 +84,9 @@ class SerialFileDownloader:
         start = time.time()
         lines = []
         while time.time() - start < timeout:
-            if self.ser.in_waiting > 0:
-                line = self.ser.readline().decode('ascii', errors='ignore').rstrip()
-                if line:
-                    lines.append(line)
+            for line in self.reader.readlines():
+                if line.strip():
+                    lines.append(line.decode('ascii', errors='ignore').rstrip())
         return lines
     
     def get_current_log_filename(self):
@@ -67,11 +96,10 @@ class SerialFileDownloader:
         # Wait for response
         start = time.time()
         while time.time() - start < TIMEOUT:
-            if self.ser.in_waiting > 0:
-                line = self.ser.readline().decode('ascii', errors='ignore').rstrip()
-                if line.startswith("LOG_FILENAME:"):
-                    filename = line.split(":", 1)[1].strip()
-                    return filename
+            for line in self.reader.readlines():
+                if line.startswith(b"LOG_FILENAME:"):
+                    filename = line.split(b":", 1)[1].strip()
+                    return filename.decode('ascii', errors='ignore')
         
         return None
     
@@ -83,98 +111,195 @@ class SerialFileDownloader:
         dirs = []
         receiving = False
         
+        done = False
         start = time.time()
-        while time.time() - start < TIMEOUT:
-            if self.ser.in_waiting > 0:
-                line = self.ser.readline().decode('ascii', errors='ignore').rstrip()
+        while not done and time.time() - start < TIMEOUT:
+            for line in self.reader.readlines():
+                line = line.rstrip()
                 
-                if line == "FILE_LIST_START":
+                if line == b"FILE_LIST_START":
                     receiving = True
                     start = time.time()
-                elif line == "FILE_LIST_END":
+                elif line == b"FILE_LIST_END":
+                    done = True
                     break
-                elif line.startswith("FILE_LIST_ERROR:"):
-                    error_msg = line.split(":", 1)[1] if ":" in line else "Unknown error"
+                elif line.startswith(b"FILE_LIST_ERROR:"):
+                    error_msg = line.split(b":", 1)[1].decode('ascii', errors='ignore')
                     sys.stderr.write(f"ERROR: {error_msg}\n")
                     return None
                 elif receiving:
-                    if line.startswith("FILE:"):
-                        parts = line.split(":", 2)
+                    if line.startswith(b"FILE:"):
+                        parts = line.split(b":", 2)
                         if len(parts) == 3:
-                            filename = parts[1]
+                            filename = parts[1].decode('ascii', errors='ignore')
                             size = int(parts[2])
                             files.append({"name": filename, "size": size, "type": "file"})
-                    elif line.startswith("DIR:"):
-                        dirname = line.split(":", 1)[1]
+                    elif line.startswith(b"DIR:"):
+                        dirname = line.split(b":", 1)[1].decode('ascii', errors='ignore')
                         dirs.append({"name": dirname, "size": 0, "type": "dir"})
         
         # Sort: directories first, then files by name
         result = sorted(dirs, key=lambda x: x["name"]) + sorted(files, key=lambda x: x["name"])
         return result
     
-    def download_file(self, filename, progress_callback=None):
-        """Download file from SD card"""
+    def download_file(self, filename, local_path, progress_callback=None):
+        """Download file from SD card, streaming it to local_path.
+
+        Uses the length-prefixed binary transfer when the firmware supports
+        it and falls back to the line-based DOWNLOAD_FILE protocol otherwise.
+
+        Returns (bytes_written, None) on success or (None, error) on failure.
+        A partially written local file is removed on failure.
+        """
+        if progress_callback:
+            progress_callback = throttle_progress(progress_callback)
+        
+        if self.binary_supported is not False:
+            result = self.download_file_binary(filename, local_path, progress_callback)
+            if result is not None:
+                self.binary_supported = True
+                return result
+            # Drop anything a slow reply left behind so the ASCII transfer
+            # doesn't start in the middle of a binary payload
+            self.ser.reset_input_buffer()
+            self.reader.buf.clear()
+        
+        return self.download_file_ascii(filename, local_path, progress_callback)
+    
+    def download_file_binary(self, filename, local_path, progress_callback=None):
+        """Download file using DOWNLOAD_FILE_BIN.
+
+        Returns None if no FILE_BIN_START header arrived in time.
+        """
+        with open(local_path, 'wb') as f:
+            size, error = self._receive_binary(filename, f, progress_callback)
+        
+        if size is None and error is None:
+            return None
+        if error:
+            os.remove(local_path)
+        return size, error
+    
+    def _receive_binary(self, filename, f, progress_callback):
+        """Request filename with DOWNLOAD_FILE_BIN and write the payload to f.
+
+        Returns (size, None) on success, (None, error) on failure and
+        (None, None) if no FILE_BIN_START header arrived in time. The
+        firmware is only marked as lacking the command when nothing at all
+        came back; a reply other than the header may just be a slow card.
+        """
+        self.send_command(f"DOWNLOAD_FILE_BIN:{filename}")
+        
+        # Wait for the header line
+        answered = False
+        start = time.time()
+        while True:
+            if time.time() - start >= TIMEOUT:
+                # Older firmware silently ignores the unknown command
+                if not answered and not self.reader.buf:
+                    self.binary_supported = False
+                return None, None
+            line = self.reader.readline()
+            if line is not None:
+                answered = True
+            if line == b"FILE_BIN_START":
+                break
+            if line and line.startswith(b"FILE_ERROR:"):
+                return None, line.split(b":", 1)[1].decode('ascii', errors='ignore')
+        
+        header = b""
+        while len(header) < 4:
+            more = self.reader.read(4 - len(header))
+            if not more:
+                return None, "Transfer timed out"
+            header += more
+        file_size = int.from_bytes(header, 'little')
+        
+        remaining = file_size
+        while remaining:
+            chunk = self.reader.read(min(remaining, 65536))
+            if not chunk:
+                return None, "Transfer timed out"
+            f.write(chunk)
+            remaining -= len(chunk)
+            
+            if progress_callback and file_size > 0:
+                received = file_size - remaining
+                progress_callback((received / file_size) * 100, received, file_size)
+        
+        return file_size, None
+    
+    def download_file_ascii(self, filename, local_path, progress_callback=None):
+        """Download file using the line-based DOWNLOAD_FILE protocol"""
         self.send_command(f"DOWNLOAD_FILE:{filename}")
         
         # Wait for file transfer to begin
-        file_data = []
         receiving = False
         file_size = 0
         bytes_received = 0
+        error = None
         
-        start = time.time()
-        while time.time() - start < TIMEOUT * 10:  # Extended timeout for large files
-            if self.ser.in_waiting > 0:
-                line = self.ser.readline().decode('ascii', errors='ignore').rstrip()
-                
-                if line.startswith("FILE_SIZE:"):
-                    file_size = int(line.split(":", 1)[1])
-                    receiving = True
-                    start = time.time()  # Reset timeout
-                
-                elif line == "FILE_START":
-                    receiving = True
-                    start = time.time()
-                
-                elif line == "FILE_END":
-                    receiving = False
-                    break
-                
-                elif line.startswith("FILE_ERROR:"):
-                    error = line.split(":", 1)[1]
-                    return None, error
-                
-                elif receiving and line:
-                    file_data.append(line)
-                    bytes_received += len(line) + 1  # +1 for newline
+        with open(local_path, 'wb') as f:
+            done = False
+            start = time.time()
+            while not done and time.time() - start < TIMEOUT * 10:  # Extended timeout for large files
+                for line in self.reader.readlines():
+                    if line.startswith(b"FILE_SIZE:"):
+                        file_size = int(line.split(b":", 1)[1])
+                        receiving = True
+                        start = time.time()  # Reset timeout
+                    
+                    elif line == b"FILE_START":
+                        receiving = True
+                        start = time.time()
                     
-                    # Progress callback
-                    if progress_callback and file_size > 0:
-                        progress = (bytes_received / file_size) * 100
-                        progress_callback(progress, bytes_received, file_size)
+                    elif line == b"FILE_END":
+                        receiving = False
+                        done = True
+                        break
+                    
+                    elif line.startswith(b"FILE_ERROR:"):
+                        error = line.split(b":", 1)[1].decode('ascii', errors='ignore')
+                        done = True
+                        break
+                    
+                    elif receiving and line:
+                        f.write(line)
+                        f.write(b"\n")
+                        bytes_received += len(line) + 1  # +1 for newline
+                        
+                        # Progress callback
+                        if progress_callback and file_size > 0:
+                            progress = (bytes_received / file_size) * 100
+                            progress_callback(progress, bytes_received, file_size)
+        
+        if not error and not bytes_received:
+            error = "No data received"
         
-        if not file_data:
-            return None, "No data received"
+        if error:
+            os.remove(local_path)
+            return None, error
         
-        return "\n".join(file_data), None
+        return bytes_received, None
     
     def close(self):
         """Close serial connection"""
         self.ser.close()
 
 
+SIZE_UNITS = ['B', 'KB', 'MB', 'GB', 'TB']
+
 def format_size(size):
     """Format file size in human-readable format"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size < 1024.0:
-            return f"{size:.1f} {unit}"
-        size /= 1024.0
-    return f"{size:.1f} TB"
+    # Each unit step is 10 bits, so the bit length picks the unit directly
+    i = min(len(SIZE_UNITS) - 1, max(0, (int(size).bit_length() - 1) // 10))
+    return f"{size / (1 << (10 * i)):.1f} {SIZE_UNITS[i]}"
 
 
 def draw_menu(stdscr, files, current_row, status_msg=""):
     """Draw the file selection menu"""
-    stdscr.clear()
+    # erase() rather than clear(): clear() forces a full terminal repaint
+    stdscr.erase()
     h, w = stdscr.getmaxyx()
     
     # Title
@@ -233,16 +358,84 @@ def draw_menu(stdscr, files, current_row, status_msg=""):
     stdscr.refresh()
 
 
+def draw_status(stdscr, status_msg):
+    """Redraw only the status line, leaving the file list untouched"""
+    h, w = stdscr.getmaxyx()
+    if len(status_msg) > w - 2:
+        status_msg = status_msg[:w-5] + "..."
+    try:
+        stdscr.move(h - 1, 0)
+        stdscr.clrtoeol()
+        stdscr.addstr(h - 1, 1, status_msg)
+    except curses.error:
+        pass
+    stdscr.refresh()
+
+
+SPINNER = "|/-\\"
+
+# Returned by run_in_background() when the user quits while waiting
+CANCELLED = object()
+
+def run_in_background(stdscr, status_msg, func, updates=None):
+    """Run func() in a worker thread while keeping the TUI responsive.
+
+    The status line shows a spinner next to status_msg, or next to the latest
+    message put on the updates queue. Only this thread draws, so workers
+    report progress through the queue rather than touching curses.
+    Exceptions raised by func() are re-raised here. Returns func()'s result,
+    or CANCELLED if the user pressed q.
+    """
+    done = queue.Queue()
+    
+    def worker():
+        try:
+            done.put((func(), None))
+        except Exception as e:
+            done.put((None, e))
+    
+    threading.Thread(target=worker, daemon=True).start()
+    
+    stdscr.timeout(100)  # getch() doubles as the redraw tick
+    try:
+        tick = 0
+        while True:
+            try:
+                result, error = done.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                if error:
+                    raise error
+                return result
+            
+            if updates is not None:
+                while not updates.empty():
+                    status_msg = updates.get_nowait()
+            
+            draw_status(stdscr, f"{SPINNER[tick % len(SPINNER)]} {status_msg}")
+            tick += 1
+            
+            key = stdscr.getch()
+            if key == ord('q') or key == ord('Q'):
+                return CANCELLED
+    finally:
+        stdscr.timeout(-1)
+
+
 def tui_main(stdscr, downloader):
     """Main TUI loop"""
     curses.curs_set(0)  # Hide cursor
     stdscr.keypad(True)
     
     current_row = 0
-    status_msg = "Loading files..."
     
     # Initial file list load
-    files = downloader.list_files()
+    draw_menu(stdscr, [], current_row)
+    files = run_in_background(stdscr, "Loading files... (q: Quit)", downloader.list_files)
+    
+    if files is CANCELLED:
+        return None
     
     if files is None:
         return "ERROR: Could not list files from ESP32"
@@ -252,23 +445,33 @@ def tui_main(stdscr, downloader):
     
     status_msg = f"Found {len(files)} items"
     
+    # Only redraw the full menu when something visible changed
+    dirty = True
+    
     while True:
-        draw_menu(stdscr, files, current_row, status_msg)
+        if dirty:
+            draw_menu(stdscr, files, current_row, status_msg)
+            dirty = False
         
         key = stdscr.getch()
         
         if key == curses.KEY_UP and current_row > 0:
             current_row -= 1
             status_msg = ""
+            dirty = True
         elif key == curses.KEY_DOWN and current_row < len(files) - 1:
             current_row += 1
             status_msg = ""
+            dirty = True
+        elif key == curses.KEY_RESIZE:
+            dirty = True
         elif key == ord('q') or key == ord('Q'):
             return None
         elif key == ord('r') or key == ord('R'):
-            status_msg = "Refreshing..."
-            draw_menu(stdscr, files, current_row, status_msg)
-            files = downloader.list_files()
+            refreshed = run_in_background(stdscr, "Refreshing...", downloader.list_files)
+            if refreshed is CANCELLED:
+                return None
+            files = refreshed
             if files is None:
                 status_msg = "ERROR: Could not refresh file list"
             elif not files:
@@ -276,36 +479,52 @@ def tui_main(stdscr, downloader):
             else:
                 status_msg = f"Refreshed: {len(files)} items found"
             current_row = min(current_row, len(files) - 1) if files else 0
+            dirty = True
         elif key == ord('\n') or key == curses.KEY_ENTER or key == 10 or key == 13:
             selected = files[current_row]
+            dirty = True
             
             if selected["type"] == "dir":
                 status_msg = "Cannot download directories"
             else:
                 filename = "/" + selected["name"]
-                status_msg = f"Downloading {selected['name']}..."
-                draw_menu(stdscr, files, current_row, status_msg)
+                # Download progress callback (runs in the worker thread,
+                # throttled by download_file)
+                progress = queue.Queue()
                 
-                # Download progress callback
                 def progress_cb(percent, current, total):
-                    msg = f"Downloading: {percent:.1f}% ({format_size(current)} / {format_size(total)})"
-                    draw_menu(stdscr, files, current_row, msg)
+                    progress.put(f"Downloading: {percent:.1f}% ({format_size(current)} / {format_size(total)})")
+                
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                local_filename = f"{DOWNLOAD_DIR}/{selected['name'].replace('.csv', '')}_{timestamp}.csv"
                 
-                file_content, error = downloader.download_file(filename, progress_cb)
+                try:
+                    result = run_in_background(
+                        stdscr,
+                        f"Downloading {selected['name']}...",
+                        lambda: downloader.download_file(filename, local_filename, progress_cb),
+                        progress
+                    )
+                except serial.SerialException as e:
+                    # An IOError subclass, but the device went away, not the disk
+                    result = None, f"Serial connection lost: {e}"
+                except IOError as e:
+                    result = None, f"Could not save file: {e}"
+                
+                if result is CANCELLED:
+                    # Best effort: the worker may still hold the file open
+                    try:
+                        os.remove(local_filename)
+                    except OSError:
+                        pass
+                    return None
+                
+                size, error = result
                 
                 if error:
                     status_msg = f"ERROR: {error}"
-                elif file_content:
-                    # Save file
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    local_filename = f"{DOWNLOAD_DIR}/{selected['name'].replace('.csv', '')}_{timestamp}.csv"
-                    
-                    try:
-                        with open(local_filename, 'w') as f:
-                            f.write(file_content)
-                        status_msg = f"✓ Saved to {local_filename} ({format_size(len(file_content))})"
-                    except IOError as e:
-                        status_msg = f"ERROR: Could not save file: {e}"
+                elif size:
+                    status_msg = f"✓ Saved to {local_filename} ({format_size(size)})"
                 else:
                     status_msg = "ERROR: Download failed"
     
@@ -8,6 +8,12 @@
 #include <sys/stat.h>
 #include <errno.h>
 #include <fcntl.h>
+#include <stdint.h>
+#include "sdkconfig.h"
+#include "driver/uart_vfs.h"
+#if CONFIG_ESP_CONSOLE_USB_SERIAL_JTAG_ENABLED
+#include "driver/usb_serial_jtag_vfs.h"
+#endif
 
 #define COMMAND_BUFFER_SIZE 256
 #define FILE_CHUNK_SIZE 512
@@ -134,6 +140,95 @@ static void handle_download_file(const char *filename)
   fflush(stdout);
 }
 
+// Console VFS drivers translate '\n' on output (CRLF by default), which would
+// corrupt a binary payload. Switch translation off for the transfer.
+static void set_console_tx_line_endings(esp_line_endings_t mode)
+{
+  fflush(stdout);
+#if CONFIG_ESP_CONSOLE_UART
+  uart_vfs_dev_port_set_tx_line_endings(CONFIG_ESP_CONSOLE_UART_NUM, mode);
+#endif
+#if CONFIG_ESP_CONSOLE_USB_SERIAL_JTAG_ENABLED
+  usb_serial_jtag_vfs_set_tx_line_endings(mode);
+#endif
+}
+
+static esp_line_endings_t default_console_tx_line_endings()
+{
+#if CONFIG_LIBC_STDOUT_LINE_ENDING_LF || CONFIG_NEWLIB_STDOUT_LINE_ENDING_LF
+  return ESP_LINE_ENDINGS_LF;
+#elif CONFIG_LIBC_STDOUT_LINE_ENDING_CR || CONFIG_NEWLIB_STDOUT_LINE_ENDING_CR
+  return ESP_LINE_ENDINGS_CR;
+#else
+  return ESP_LINE_ENDINGS_CRLF;
+#endif
+}
+
+// Binary variant of DOWNLOAD_FILE: replies with FILE_BIN_START, then the file
+// size as a 4-byte little-endian integer, then exactly that many raw bytes.
+static void handle_download_file_bin(const char *filename)
+{
+  bool exists = false;
+  esp_err_t err = sd_card_file_exists(filename, &exists);
+
+  if (err != ESP_OK || !exists)
+  {
+    printf("FILE_ERROR:File not found\n");
+    fflush(stdout);
+    return;
+  }
+
+  size_t file_size = 0;
+  err = sd_card_get_file_size(filename, &file_size);
+
+  if (err != ESP_OK)
+  {
+    printf("FILE_ERROR:Cannot get file size\n");
+    fflush(stdout);
+    return;
+  }
+
+  FILE *fp = sd_card_fopen(filename, "rb");
+  if (!fp)
+  {
+    printf("FILE_ERROR:Cannot open file\n");
+    fflush(stdout);
+    return;
+  }
+
+  printf("FILE_BIN_START\n");
+  set_console_tx_line_endings(ESP_LINE_ENDINGS_LF);
+
+  uint8_t header[4] = {
+      (uint8_t)(file_size & 0xFF),
+      (uint8_t)((file_size >> 8) & 0xFF),
+      (uint8_t)((file_size >> 16) & 0xFF),
+      (uint8_t)((file_size >> 24) & 0xFF),
+  };
+  fwrite(header, 1, sizeof(header), stdout);
+
+  // Stop on a read error or short file; the host times out waiting for the
+  // missing bytes and discards the partial download
+  char chunk[FILE_CHUNK_SIZE];
+  size_t remaining = file_size;
+
+  while (remaining > 0)
+  {
+    size_t want = remaining < sizeof(chunk) ? remaining : sizeof(chunk);
+    size_t bytes_read = fread(chunk, 1, want, fp);
+    if (bytes_read == 0)
+    {
+      break;
+    }
+    fwrite(chunk, 1, bytes_read, stdout);
+    remaining -= bytes_read;
+  }
+
+  fclose(fp);
+
+  set_console_tx_line_endings(default_console_tx_line_endings());
+}
+
 static void process_command(const char *cmd)
 {
   if (strncmp(cmd, "GET_LOG_FILENAME", 16) == 0)
@@ -144,6 +239,11 @@ static void process_command(const char *cmd)
   {
     handle_list_files();
   }
+  else if (strncmp(cmd, "DOWNLOAD_FILE_BIN:", 18) == 0)
+  {
+    const char *filename = cmd + 18;
+    handle_download_file_bin(filename);
+  }
   else if (strncmp(cmd, "DOWNLOAD_FILE:", 14) == 0)
   {
     const char *filename = cmd + 14;
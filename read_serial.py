@@ -4,6 +4,8 @@ import matplotlib.pyplot as plt
 import argparse
 import sys
 
+from serial_utils import LineReader, configure_port
+
 # --- Parse command-line arguments ---
 parser = argparse.ArgumentParser(
     description='Real-time visualization of ESP32 depth data via serial',
@@ -30,56 +32,83 @@ ROWS = args.rows
 COLS = args.cols
 
 DEPTH_CHARS = " .:-=+*#%@"
-CHAR_TO_VALUE = {c: i for i, c in enumerate(DEPTH_CHARS)}
+
+# Byte -> depth level lookup table (unknown characters map to 0)
+LUT = np.zeros(256, dtype=np.float32)
+for i, c in enumerate(DEPTH_CHARS):
+    LUT[ord(c)] = i
 
 try:
     ser = serial.Serial(PORT, BAUD, timeout=args.timeout)
+    configure_port(ser)
     print(f"Connected to {PORT} at {BAUD} baud")
 except serial.SerialException as e:
     print(f"ERROR: Could not open serial port {PORT}: {e}")
     sys.exit(1)
 
-def read_frame():
-    rows = []
+reader = LineReader(ser)
+
+def read_frames():
+    """Yield depth frames as they arrive on the serial port"""
+    # Rows land directly in one contiguous buffer, used as a ring so that
+    # only the last ROWS lines before FRAME_END are kept
+    buf = bytearray(ROWS * COLS)
+    mv = memoryview(buf)
+    count = 0  # rows received since the last FRAME_END
 
     while True:
-        line = ser.readline().decode("ascii", errors="ignore").rstrip("\r\n")
-
-        if not line:
-            continue
-
-        if line == "FRAME_END":
-            if len(rows) == ROWS:
-                frame = np.zeros((ROWS, COLS), dtype=np.float32)
-                for r in range(ROWS):
-                    for c, ch in enumerate(rows[r]):
-                        frame[r, c] = CHAR_TO_VALUE.get(ch, 0)
-                return frame
-            else:
-                rows.clear()
+        for line in reader.readlines():
+            if not line:
+                continue
+
+            if line == b"FRAME_END":
+                if count >= ROWS:
+                    frame = LUT[np.frombuffer(buf, dtype=np.uint8)].reshape(ROWS, COLS)
+                    # Oldest row sits at the write cursor once the ring has wrapped
+                    start = count % ROWS
+                    yield np.roll(frame, -start, axis=0) if start else frame
+                count = 0
                 continue
 
-        if len(line) == COLS:
-            rows.append(line)
-            if len(rows) > ROWS:
-                rows.pop(0)
+            if len(line) == COLS:
+                row = count % ROWS
+                mv[row * COLS:(row + 1) * COLS] = line
+                count += 1
 
 
 def main():
     plt.ion()
     frame = np.zeros((ROWS, COLS))
 
-    img = plt.imshow(frame, cmap=args.cmap, vmin=0, vmax=len(DEPTH_CHARS) - 1)
-    plt.colorbar(label="Relative depth")
-    plt.title(f"Depth Visualization - {PORT} @ {BAUD} baud")
-    plt.axis("off")
+    fig, ax = plt.subplots()
+    # Animated artists are left out of normal draws so the saved
+    # background holds everything except the image itself
+    img = ax.imshow(frame, cmap=args.cmap, vmin=0, vmax=len(DEPTH_CHARS) - 1,
+                    animated=True)
+    fig.colorbar(img, ax=ax, label="Relative depth")
+    ax.set_title(f"Depth Visualization - {PORT} @ {BAUD} baud")
+    ax.axis("off")
+
+    # Re-capture the background whenever the figure is fully redrawn (e.g. resize)
+    bg = None
+
+    def on_draw(event):
+        nonlocal bg
+        bg = fig.canvas.copy_from_bbox(ax.bbox)
+        ax.draw_artist(img)
+
+    fig.canvas.mpl_connect("draw_event", on_draw)
+    plt.show(block=False)
+    plt.pause(0.1)
 
     print("Receiving data... (Press Ctrl+C to stop)")
     try:
-        while True:
-            frame = read_frame()
+        for frame in read_frames():
             img.set_data(frame)
-            plt.pause(0.001)
+            fig.canvas.restore_region(bg)
+            ax.draw_artist(img)
+            fig.canvas.blit(ax.bbox)
+            fig.canvas.flush_events()
     except KeyboardInterrupt:
         print("\nStopped by user")
         ser.close()
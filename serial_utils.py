@@ -0,0 +1,91 @@
+"""
+Serial helpers shared by the ESP32 host tools.
+"""
+
+import sys
+
+
+def configure_port(ser):
+    """Tune an open port for sustained high-baud input.
+
+    Enlarges the driver buffers on Windows (the 4 KB default overflows during
+    bursts at 921600 baud) and enables ASYNC_LOW_LATENCY on Linux so the
+    driver hands data over immediately instead of batching it for ~16 ms.
+    Both are best effort: unsupported drivers are left as they are.
+    """
+    if sys.platform == 'win32':
+        try:
+            ser.set_buffer_size(rx_size=1 << 17, tx_size=1 << 15)
+        except (OSError, ValueError, NotImplementedError):
+            pass
+
+    # pyserial defines set_low_latency_mode on every POSIX port, but it
+    # raises NotImplementedError outside Linux
+    if sys.platform.startswith('linux'):
+        try:
+            ser.set_low_latency_mode(True)
+        except (OSError, ValueError, NotImplementedError):
+            # e.g. USB CDC-ACM devices don't implement TIOCSSERIAL
+            pass
+
+
+class LineReader:
+    """Read newline-terminated lines from a serial port in blocks.
+
+    pyserial's readline() pulls one byte per read() call, which costs a
+    syscall per byte at 921600 baud. This reads whatever is waiting in one
+    call and does the line splitting in Python instead.
+    """
+
+    def __init__(self, ser):
+        self.ser = ser
+        self.buf = bytearray()
+        # Roughly 1/8 s worth of data per read, never less than 4 KB
+        self.chunk_size = max(4096, ser.baudrate // 80)
+
+    def _fill(self):
+        waiting = self.ser.in_waiting
+        self.buf += self.ser.read(min(max(waiting, 1), self.chunk_size))
+
+    def _take_line(self):
+        end = self.buf.find(b"\n")
+        if end < 0:
+            return None
+        line = bytes(self.buf[:end].rstrip(b"\r"))
+        del self.buf[:end + 1]
+        return line
+
+    def readlines(self):
+        """Yield the complete lines received so far, without line endings.
+
+        Blocks for at most the port timeout when nothing is waiting. Lines are
+        only removed from the buffer as they are yielded, so a caller that
+        stops at an end marker leaves the rest for the next read. A partial
+        trailing line is kept until its newline arrives.
+        """
+        self._fill()
+        while True:
+            line = self._take_line()
+            if line is None:
+                return
+            yield line
+
+    def readline(self):
+        """Return a single line, or None if none completed within the timeout.
+
+        Anything after the line stays buffered, so raw data following a
+        header line can still be fetched with read().
+        """
+        line = self._take_line()
+        if line is None:
+            self._fill()
+            line = self._take_line()
+        return line
+
+    def read(self, size):
+        """Return up to size raw bytes, draining buffered data first"""
+        if not self.buf:
+            return self.ser.read(size)
+        data = bytes(self.buf[:size])
+        del self.buf[:size]
+        return data
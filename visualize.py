@@ -1,23 +1,29 @@
 import numpy as np
 import pandas as pd
 import matplotlib
-matplotlib.use("Agg")
-
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from PIL import Image, ImageDraw
 from tqdm import tqdm
 import argparse
+import shutil
+import subprocess
 import sys
 
+# Optional: pyarrow parses CSV on all cores, much faster for long logs
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pacsv = None
+
 # --- Parse command-line arguments ---
 parser = argparse.ArgumentParser(
-    description='Create GIF animation from CSV depth log files',
+    description='Create GIF or MP4 animation from CSV depth log files',
     formatter_class=argparse.ArgumentDefaultsHelpFormatter
 )
 parser.add_argument('csv_file', nargs='?', default='revised_log_0053.csv',
                     help='Input CSV file path')
 parser.add_argument('-o', '--output', default='depth_animation.gif',
-                    help='Output file path (GIF format)')
+                    help='Output file path (.gif, or .mp4 with ffmpeg installed)')
 parser.add_argument('-f', '--fps', type=int, default=15,
                     help='Frames per second')
 parser.add_argument('--dpi', type=int, default=80,
@@ -32,8 +38,13 @@ parser.add_argument('--cmap', default='viridis',
 args = parser.parse_args()
 
 # Validate output format
-if not args.output.lower().endswith('.gif'):
-    print("WARNING: Pillow writer only supports GIF format.")
+write_mp4 = args.output.lower().endswith('.mp4')
+if write_mp4:
+    if shutil.which('ffmpeg') is None:
+        print("ERROR: MP4 output requires ffmpeg on the PATH")
+        sys.exit(1)
+elif not args.output.lower().endswith('.gif'):
+    print("WARNING: Only GIF and MP4 output formats are supported.")
     print(f"Changing output from '{args.output}' to '{args.output.rsplit('.', 1)[0]}.gif'")
     args.output = args.output.rsplit('.', 1)[0] + '.gif'
 
@@ -43,8 +54,40 @@ FRAME_DT_MS = 1000 / FPS
 csv_path = args.csv_file
 
 # --- Load CSV ---
+def load_csv(path):
+    """Read the log as a float32 (rows, columns) array, preferring pyarrow's parser"""
+    if pacsv is not None:
+        # pyarrow has no comment support; the log's comments are a leading header
+        skip = 0
+        num_columns = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.startswith(b'#'):
+                    num_columns = line.count(b',') + 1
+                    break
+                skip += 1
+        try:
+            # Parse straight to float32; pyarrow names the columns f0, f1, ...
+            table = pacsv.read_csv(
+                path,
+                read_options=pacsv.ReadOptions(skip_rows=skip, autogenerate_column_names=True),
+                convert_options=pacsv.ConvertOptions(
+                    column_types={f"f{i}": pa.float32() for i in range(num_columns)}
+                )
+            )
+        except pa.ArrowInvalid:
+            pass  # e.g. comment lines further down; let pandas handle it
+        else:
+            # Fill one preallocated array column by column rather than going
+            # through a float64 DataFrame copy
+            values = np.empty((table.num_rows, table.num_columns), dtype=np.float32)
+            for i, column in enumerate(table.columns):
+                values[:, i] = column.to_numpy()
+            return values
+    return pd.read_csv(path, comment="#", header=None, dtype=np.float32).to_numpy()
+
 try:
-    df = pd.read_csv(csv_path, comment="#", header=None)
+    values = load_csv(csv_path)
 except FileNotFoundError:
     print(f"ERROR: File not found: {csv_path}")
     sys.exit(1)
@@ -53,68 +96,99 @@ except Exception as e:
     sys.exit(1)
 
 # --- Parse frames ---
-frames = []
-
-for _, row in df.iterrows():
-    w = int(row.iloc[3])
-    h = int(row.iloc[4])
-    data = row.iloc[5:].to_numpy(dtype=np.float32)
-    frames.append(data.reshape((h, w)))
-
-frames = np.stack(frames)
-num_frames = len(frames)
-
-# --- Figure setup (keep it minimal) ---
-fig, ax = plt.subplots(figsize=(4, 4))
-im = ax.imshow(
-    frames[0],
-    cmap=args.cmap,
-    vmin=args.vmin,
-    vmax=args.vmax,
-    animated=False
-)
+# Columns: Frame, Steering, Throttle, Width, Height, Data...
+sizes = values[:, 3:5].astype(np.int64)
+w, h = sizes[0]
+if (sizes != sizes[0]).any():
+    print("ERROR: Frame dimensions change within the log; cannot build one animation")
+    sys.exit(1)
+if values.shape[1] < 5 + w * h:
+    print(f"ERROR: Rows hold fewer than Width*Height ({w}x{h}) depth values")
+    sys.exit(1)
 
-ax.axis("off")  # faster than drawing ticks
-text = ax.text(
-    0.02, 0.98, "",
-    transform=ax.transAxes,
-    color="white",
-    fontsize=9,
-    va="top",
-    bbox=dict(facecolor="black", alpha=0.5, pad=2)
-)
+# Copy the pixel columns into a preallocated stack, then free the table
+num_frames = len(values)
+frames = np.empty((num_frames, h, w), dtype=np.float32)
+frames.reshape(num_frames, -1)[:] = values[:, 5:5 + w * h]
+del values
 
-# --- Update ---
-def update(i):
-    im.set_data(frames[i])
-    text.set_text(f"Frame {i}  |  {i * FRAME_DT_MS:.0f} ms")
-    return im, text
-
-ani = FuncAnimation(
-    fig,
-    update,
-    frames=num_frames,
-    interval=FRAME_DT_MS,
-    blit=False   # IMPORTANT: faster with text overlays
-)
+# --- Colorize all frames at once ---
+# Frames become palette indices into a uint8 colormap table: coloring is a
+# byte lookup and GIF frames need no per-frame quantization. The last three
+# palette entries are reserved for the label and for missing (NaN) pixels.
+LEVELS = 253
+LABEL_BG, LABEL_FG, BAD = LEVELS, LEVELS + 1, LEVELS + 2
 
-# --- Progress bar ---
-pbar = tqdm(total=num_frames, desc="Encoding")
+try:
+    # Colormap registry only; pyplot and its GUI backends are never imported
+    cmap = matplotlib.colormaps[args.cmap]
+except KeyError:
+    print(f"ERROR: Unknown colormap: {args.cmap}")
+    sys.exit(1)
 
-def progress_callback(i, total):
-    pbar.update(1)
+lut = (cmap(np.linspace(0, 1, LEVELS))[:, :3] * 255).astype(np.uint8)
+# Short rows are NaN-padded by the parser; draw them in the colormap's "bad"
+# color over the white background, as imshow did
+bad_rgba = np.array(cmap.get_bad())
+bad = ((bad_rgba[:3] * bad_rgba[3] + (1 - bad_rgba[3])) * 255).astype(np.uint8)
+palette = np.concatenate([lut, [[0, 0, 0], [255, 255, 255], bad]]).flatten().tolist()
+
+value_scale = (LEVELS - 1) / max(args.vmax - args.vmin, 1e-6)
+scaled = np.clip((frames - args.vmin) * value_scale, 0, LEVELS - 1)
+indices = np.where(np.isnan(scaled), BAD, np.nan_to_num(scaled)).astype(np.uint8)
+del scaled
+
+# Same 4-inch output size the matplotlib figure used to have
+scale = max(1, round(4 * args.dpi / max(h, w)))
+size = (w * scale, h * scale)
+
+# --- Render frames ---
+def render_frame(i):
+    img = Image.fromarray(indices[i], mode="P").resize(size, Image.NEAREST)
+    img.putpalette(palette)
+    draw = ImageDraw.Draw(img)
+    label = f"Frame {i}  |  {i * FRAME_DT_MS:.0f} ms"
+    left, top, right, bottom = draw.textbbox((4, 4), label)
+    draw.rectangle((left - 2, top - 2, right + 2, bottom + 2), fill=LABEL_BG)
+    draw.text((4, 4), label, fill=LABEL_FG)
+    return img
 
-# --- Save using Pillow writer (GIF format only) ---
 print(f"Saving animation to {args.output}...")
-print("Note: Using Pillow writer (GIF format). For MP4, use ffmpeg.")
-
-ani.save(
-    args.output,
-    writer="pillow",
-    fps=FPS,
-    dpi=args.dpi,
-    progress_callback=progress_callback
-)
 
-pbar.close()
+if write_mp4:
+    # --- Pipe raw RGB frames straight into ffmpeg ---
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+        '-s', f'{size[0]}x{size[1]}', '-r', str(FPS),
+        '-i', '-',
+        # yuv420p needs even dimensions
+        '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        args.output
+    ]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    try:
+        for i in tqdm(range(num_frames), desc="Encoding"):
+            proc.stdin.write(render_frame(i).convert("RGB").tobytes())
+    except BrokenPipeError:
+        pass
+    proc.stdin.close()
+    if proc.wait() != 0:
+        print(f"ERROR: ffmpeg exited with code {proc.returncode}")
+        sys.exit(1)
+else:
+    print("Note: Writing GIF with Pillow. Use a .mp4 output for ffmpeg.")
+    images = [render_frame(i) for i in tqdm(range(num_frames), desc="Encoding")]
+    
+    # --- Save GIF ---
+    images[0].save(
+        args.output,
+        save_all=True,
+        append_images=images[1:],
+        duration=FRAME_DT_MS,
+        loop=0,
+        optimize=False
+    )
+
 print(f"✓ Animation saved to {args.output}")
@@ -6,13 +6,13 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['numpy', 'pandas', 'matplotlib', 'matplotlib.backends.backend_agg', 'PIL', 'PIL._imaging'],
+    hiddenimports=['numpy', 'pandas', 'matplotlib', 'PIL', 'PIL._imaging'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter', 'IPython', 'pytest', 'matplotlib.pyplot', 'matplotlib.backends.backend_tkagg', 'matplotlib.backends.backend_tkcairo', 'matplotlib.backends._backend_tk', 'pyarrow'],
     noarchive=False,
-    optimize=0,
+    optimize=2,
 )
 pyz = PYZ(a.pure)
 
@@ -21,7 +21,7 @@ exe = EXE(
     a.scripts,
     a.binaries,
     a.datas,
-    [],
+    [('O', None, 'OPTION'), ('O', None, 'OPTION')],
     name='visualize',
     debug=False,
     bootloader_ignore_signals=False,